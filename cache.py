@@ -0,0 +1,98 @@
+"""TTL cache for upstream API responses (Redis, with in-memory fallback)"""
+import logging
+import os
+import threading
+import time
+
+import orjson
+import redis
+
+logger = logging.getLogger('stock_server.cache')
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+# How long the last good value is kept around to serve when an upstream API fails
+STALE_TTL = 24 * 60 * 60
+
+# Upper bound on entries kept by the in-memory fallback store
+MEMORY_MAX_ENTRIES = 1024
+
+class MemoryStore:
+    """Per-process stand-in for Redis when REDIS_URL is not configured"""
+
+    def __init__(self, max_entries=MEMORY_MAX_ENTRIES):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return payload
+
+    def setex(self, key, ttl, payload):
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self._max_entries:
+                # Dicts keep insertion order, so the first key is the oldest write
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + ttl, payload)
+
+def _connect():
+    """Return the shared key-value store"""
+    if REDIS_URL:
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+    return MemoryStore()
+
+store = _connect()
+
+def _get(key):
+    try:
+        payload = store.get(key)
+    except redis.RedisError as e:
+        logger.warning("⚠️ Cache read failed for %s: %s", key, e)
+        return None
+    return orjson.loads(payload) if payload is not None else None
+
+def _set(key, ttl, payload):
+    try:
+        store.setex(key, ttl, payload)
+    except redis.RedisError as e:
+        logger.warning("⚠️ Cache write failed for %s: %s", key, e)
+
+def _is_error(value):
+    return isinstance(value, dict) and 'error' in value
+
+def get_or_set(key, ttl, loader):
+    """Return the cached value for key, or call loader() and cache its result for ttl seconds
+
+    Error results (dicts with an 'error' key) and exceptions are never cached;
+    instead the last good value is returned if one is still available.
+    """
+    cached = _get(key)
+    if cached is not None:
+        return cached
+
+    stale_key = f"stale:{key}"
+    try:
+        value = loader()
+    except Exception:
+        stale = _get(stale_key)
+        if stale is not None:
+            return stale
+        raise
+
+    if _is_error(value):
+        stale = _get(stale_key)
+        return stale if stale is not None else value
+
+    payload = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    _set(key, ttl, payload)
+    _set(stale_key, STALE_TTL, payload)
+    return value
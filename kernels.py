@@ -0,0 +1,84 @@
+"""Indicator kernels over float64 NumPy arrays (JIT-compiled when numba is installed)"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional - without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+def multi_sma(close, periods=(5, 10, 20, 60)):
+    """Calculate Simple Moving Averages for several periods from one cumulative sum"""
+    n = close.shape[0]
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    smas = {}
+    for period in periods:
+        sma = np.full(n, np.nan)
+        if n >= period:
+            sma[period - 1:] = (csum[period:] - csum[:-period]) / period
+        smas[period] = sma
+    return smas
+
+@njit(cache=True, fastmath=True)
+def macd(close, fast, slow, signal):
+    """MACD, signal and histogram from one forward pass keeping all three EMAs"""
+    n = close.shape[0]
+    macd_line = np.empty(n)
+    signal_line = np.empty(n)
+    histogram = np.empty(n)
+    if n == 0:
+        return macd_line, signal_line, histogram
+    
+    alpha_fast = 2.0 / (fast + 1)
+    alpha_slow = 2.0 / (slow + 1)
+    alpha_signal = 2.0 / (signal + 1)
+    ema_fast = close[0]
+    ema_slow = close[0]
+    ema_signal = 0.0
+    for i in range(n):
+        x = close[i]
+        ema_fast += alpha_fast * (x - ema_fast)
+        ema_slow += alpha_slow * (x - ema_slow)
+        m = ema_fast - ema_slow
+        ema_signal += alpha_signal * (m - ema_signal)
+        macd_line[i] = m
+        signal_line[i] = ema_signal
+        histogram[i] = m - ema_signal
+    return macd_line, signal_line, histogram
+
+@njit(cache=True)
+def rsi_wilder(close, period):
+    """Wilder-smoothed RSI over a float64 array in a single forward pass"""
+    n = close.shape[0]
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+    
+    # Seed the averages with the simple mean of the first `period` moves
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        change = close[i] - close[i - 1]
+        if change > 0:
+            avg_gain += change
+        else:
+            avg_loss -= change
+    avg_gain /= period
+    avg_loss /= period
+    
+    for i in range(period, n):
+        if i > period:
+            change = close[i] - close[i - 1]
+            gain = change if change > 0 else 0.0
+            loss = -change if change < 0 else 0.0
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
+        
+        if avg_loss == 0.0:
+            out[i] = 100.0 if avg_gain > 0.0 else np.nan
+        else:
+            out[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out